@@ -10,6 +10,12 @@ datastore = {
     # etc.
 }
 
+# control periods, in seconds, at which each top-level task runs
+BATTERY_MANAGEMENT_PERIOD = 0.1
+OUTPUT_BUS_CONTROL_PERIOD = 0.1
+DATA_RECORDING_PERIOD = 0.01
+INTERSUBSYSTEM_COMMUNICATION_PERIOD = 0.01
+
 
 async def battery_management_task():
     """
@@ -20,7 +26,7 @@ async def battery_management_task():
     from each individual cell to maintain a balanced battery pack.
     """
     while True:
-        await asyncio.sleep(0)
+        await asyncio.sleep(BATTERY_MANAGEMENT_PERIOD)
 
 
 async def output_bus_control_task():
@@ -32,7 +38,7 @@ async def output_bus_control_task():
     and any relevant commands from CDH that should activate or deactivate a particular bus.
     """
     while True:
-        await asyncio.sleep(0)
+        await asyncio.sleep(OUTPUT_BUS_CONTROL_PERIOD)
 
 
 async def data_recording_task():
@@ -40,7 +46,7 @@ async def data_recording_task():
     Task to read all analog and digital data in the system and place it into the `datastore`.
     """
     while True:
-        await asyncio.sleep(0)
+        await asyncio.sleep(DATA_RECORDING_PERIOD)
 
 
 async def intersubsystem_communication_task():
@@ -53,7 +59,7 @@ async def intersubsystem_communication_task():
     placed into the `datastore`.
     """
     while True:
-        await asyncio.sleep(0)
+        await asyncio.sleep(INTERSUBSYSTEM_COMMUNICATION_PERIOD)
 
 
 async def gathered_task():
@@ -3,6 +3,7 @@ Driver module for the ADS1118 SPI analog-to-digital converter from Texas Instrum
 """
 
 import time
+import struct
 import asyncio
 
 import digitalio
@@ -67,29 +68,52 @@ class SamplingRate:
     RATE_860 = 7
 
 
-ADS1118_LSB_SIZES = dict(
-    [
-        (InputRange.FSR_6_144V, 187.5e-6),
-        (InputRange.FSR_4_096V, 125e-6),
-        (InputRange.FSR_2_048V, 62.5e-6),
-        (InputRange.FSR_1_024V, 31.25e-6),
-        (InputRange.FSR_0_512V, 15.625e-6),
-        (InputRange.FSR_0_256V, 7.8125e-6),
-    ]
+# every valid value for each sampling parameter, as checked by Ads1118._check_sampling_params
+_VALID_CHANNELS = frozenset(
+    (
+        MuxSelection.CH0_SINGLE_END,
+        MuxSelection.CH1_SINGLE_END,
+        MuxSelection.CH2_SINGLE_END,
+        MuxSelection.CH3_SINGLE_END,
+        MuxSelection.CH0_CH1_DIFF,
+        MuxSelection.CH0_CH3_DIFF,
+        MuxSelection.CH1_CH3_DIFF,
+        MuxSelection.CH2_CH3_DIFF,
+        MuxSelection.TEMPERATURE,
+    )
 )
-ADS1118_SPS_DELAYS = dict(
-    [
-        (SamplingRate.RATE_8, 0.125),
-        (SamplingRate.RATE_16, 0.063),
-        (SamplingRate.RATE_32, 0.032),
-        (SamplingRate.RATE_64, 0.016),
-        (SamplingRate.RATE_128, 0.008),
-        (SamplingRate.RATE_250, 0.004),
-        (SamplingRate.RATE_475, 0.003),
-        (SamplingRate.RATE_860, 0.002),
-    ]
+_VALID_INPUT_RANGES = frozenset(range(8))
+_VALID_SAMPLE_RATES = frozenset(range(8))
+
+# indexed by InputRange value; FSR_0_256V may also be encoded as 6 or 7
+ADS1118_LSB_SIZES = (
+    187.5e-6,  # InputRange.FSR_6_144V
+    125e-6,  # InputRange.FSR_4_096V
+    62.5e-6,  # InputRange.FSR_2_048V
+    31.25e-6,  # InputRange.FSR_1_024V
+    15.625e-6,  # InputRange.FSR_0_512V
+    7.8125e-6,  # InputRange.FSR_0_256V
+    7.8125e-6,
+    7.8125e-6,
+)
+# indexed by SamplingRate value
+ADS1118_SPS_DELAYS = (
+    0.125,  # SamplingRate.RATE_8
+    0.063,  # SamplingRate.RATE_16
+    0.032,  # SamplingRate.RATE_32
+    0.016,  # SamplingRate.RATE_64
+    0.008,  # SamplingRate.RATE_128
+    0.004,  # SamplingRate.RATE_250
+    0.003,  # SamplingRate.RATE_475
+    0.002,  # SamplingRate.RATE_860
 )
 ADS1118_SPI_RESET_TIME = 0.030  # ideally 28ms, but give it some wiggle room
+_SPI_RESET_TIME_NS = int(ADS1118_SPI_RESET_TIME * 1_000_000_000)
+
+# Config Register contents for each (channel, input_range, sample_rate) combination that has
+# been sampled, filled lazily so the bitfield packing only happens once per combination. Each
+# entry holds the command that starts a conversion and the one that only reads back its result
+_CONFIG_REGISTER_CACHE = {}
 
 
 class Ads1118:
@@ -102,9 +126,14 @@ class Ads1118:
         self.spi_bus = pm.create_spi(sck, mosi, miso)
         self.drdy_gpio = pm.create_digital_in_out(miso)
         self.ss_gpio = pm.create_digital_in_out(ss)
-        with self.ss_gpio as ss_gpio:
-            ss_gpio.direction = digitalio.Direction.OUTPUT
-            ss_gpio.value = True
+        # reused by every sample; nothing yields between the readout and its conversion, so
+        # concurrent samples on one ADC cannot interleave their use of it
+        self._receive_buffer = bytearray(2)
+        # the chip select pin belongs to this ADC alone, so its context is held open for the
+        # lifetime of the driver rather than being reopened for every transaction
+        self._ss = self.ss_gpio.__enter__()
+        self._ss.direction = digitalio.Direction.OUTPUT
+        self._ss.value = True
 
     # Returns either the voltage in volts, or the temperature in degrees Celsius
     async def take_sample(
@@ -129,79 +158,113 @@ class Ads1118:
         samples per second if not otherwise specified. The channel selected must be specified
         explicitly and has no default.
         """
-        Ads1118._check_sampling_params(channel, input_range, sample_rate)
-        transmit_buffer = Ads1118._build_config_register_bytearray(
+        if __debug__:
+            Ads1118._check_sampling_params(channel, input_range, sample_rate)
+        config, readback_config = Ads1118._config_register_bytes(
             channel, input_range, sample_rate
         )
-        receive_buffer = bytearray([0, 0])
+        receive_buffer = self._receive_buffer
 
-        data_ready = False
+        # send data-getting command
+        self._transfer(config, receive_buffer)
+        await self._wait_for_conversion(config, ADS1118_SPS_DELAYS[sample_rate])
+
+        # read back the result without starting another conversion
+        self._transfer(readback_config, receive_buffer)
+        return Ads1118._result_from_bytes(receive_buffer, channel, input_range)
+
+    # Returns a list with one result per (channel, input_range, sample_rate) in `samples`
+    async def take_samples(self, samples):
+        """
+        Asynchronous coroutine to sample the ADC once for each of a sequence of settings.
 
-        while not data_ready:
+        `samples` is an iterable of `(channel, input_range, sample_rate)` tuples. The results
+        are returned in a list in the same order, each as it would be from `take_sample`.
 
-            # send data-getting command
-            with self.spi_bus as spi, self.ss_gpio as ss:
-                spi.try_lock()
-                spi.configure(baudrate=1000000, polarity=0, phase=1)
-                ss.direction = digitalio.Direction.OUTPUT
-                ss.value = False
-                spi.write_readinto(transmit_buffer, receive_buffer)
-                ss.value = True
-                spi.unlock()
+        The ADS1118 shifts out the result of its last conversion while the next command is
+        shifted in, so each conversion command after the first also reads back the result of
+        the previous sample. A sequence of N samples therefore takes N + 1 SPI transactions,
+        rather than the 2N needed when calling `take_sample` repeatedly.
+        """
+        results = []
+        receive_buffer = self._receive_buffer
+        previous = None
+
+        for channel, input_range, sample_rate in samples:
+            if __debug__:
+                Ads1118._check_sampling_params(channel, input_range, sample_rate)
+            config, readback_config = Ads1118._config_register_bytes(
+                channel, input_range, sample_rate
+            )
+
+            # send data-getting command, reading out the previous sample's data
+            self._transfer(config, receive_buffer)
+            if previous is not None:
+                results.append(
+                    Ads1118._result_from_bytes(receive_buffer, previous[1], previous[2])
+                )
+            await self._wait_for_conversion(config, ADS1118_SPS_DELAYS[sample_rate])
+            previous = (readback_config, channel, input_range)
+
+        if previous is not None:
+            self._transfer(previous[0], receive_buffer)
+            results.append(
+                Ads1118._result_from_bytes(receive_buffer, previous[1], previous[2])
+            )
+        return results
+
+    # Waits for the conversion started by sending `config` to complete, resending the command
+    # if the ADC never signals that data is ready
+    async def _wait_for_conversion(self, config, conversion_delay):
+        data_ready = False
+
+        while True:
 
             # wait for data to be ready
-            await asyncio.sleep(ADS1118_SPS_DELAYS[sample_rate])
+            await asyncio.sleep(conversion_delay)
 
             # check if data is ready
-            with self.drdy_gpio as drdy, self.ss_gpio as ss:
-                ss.direction = digitalio.Direction.OUTPUT
-                ss.value = False
+            with self.drdy_gpio as drdy:
+                self._ss.value = False
                 # busy-wait for CS to DRDY propogation time, unless it takes so long that the
                 # ADC resets its SPI peripheral (at which point, quit looking for DRDY and retry
                 # the whole transaction)
                 # don't do this async because we're currently holding onto hardware
                 # we've already waited the delay time above so this should be near-instant
-                t0 = time.monotonic_ns()
-                while (not data_ready) and (
-                    (time.monotonic_ns() - t0) < ADS1118_SPI_RESET_TIME
-                ):
+                deadline = time.monotonic_ns() + _SPI_RESET_TIME_NS
+                while (not data_ready) and (time.monotonic_ns() < deadline):
                     data_ready = not drdy.value
-                ss.value = True
+                self._ss.value = True
 
-        transmit_buffer[0] = transmit_buffer[0] & 0x7F
-        with self.spi_bus as spi, self.ss_gpio as ss:
+            if data_ready:
+                return
+            self._transfer(config, self._receive_buffer)
+
+    # Runs a single SPI transaction with the ADC. The bus is shared with every other device
+    # wired to it, so it is locked and configured for the ADS1118 on each transaction rather
+    # than being held across the conversion delay, when other tasks may need it.
+    def _transfer(self, transmit_buffer, receive_buffer):
+        with self.spi_bus as spi:
             spi.try_lock()
             spi.configure(baudrate=1000000, polarity=0, phase=1)
-            ss.direction = digitalio.Direction.OUTPUT
-            ss.value = False
+            self._ss.value = False
             spi.write_readinto(transmit_buffer, receive_buffer)
-            ss.value = True
+            self._ss.value = True
             spi.unlock()
 
-        return (
-            Ads1118._temperature_from_bytes(receive_buffer)
-            if (channel == MuxSelection.TEMPERATURE)
-            else Ads1118._voltage_from_bytes(receive_buffer, input_range)
-        )
-
     @staticmethod
     def _check_channel_param(channel):
-        if channel is not MuxSelection.TEMPERATURE:
-            assert isinstance(channel, int)
-            assert channel >= 0
-            assert channel < 8
+        # the type check comes first so that floats equal to a valid value, and unhashable
+        # objects, fail the assertion instead of passing or raising TypeError
+        assert isinstance(channel, int) and channel in _VALID_CHANNELS
 
     @staticmethod
     def _check_fsr_param(input_range):
-        assert isinstance(input_range, int)
-        assert input_range >= 0
-        assert input_range < 8
+        assert isinstance(input_range, int) and input_range in _VALID_INPUT_RANGES
 
     @staticmethod
     def _check_sps_param(sample_rate):
-        assert isinstance(sample_rate, int)
-        assert sample_rate >= 0
-        assert sample_rate < 8
+        assert isinstance(sample_rate, int) and sample_rate in _VALID_SAMPLE_RATES
 
     @staticmethod
     def _check_sampling_params(channel, input_range, sample_rate):
@@ -224,20 +287,34 @@ class Ads1118:
         )
 
     @staticmethod
-    def _int_from_two_bytes_signed_be(buffer: bytearray):
-        output = 0
-        if buffer[0] & 0x80:
-            output -= 65536
-        output += 256 * buffer[0]
-        output += buffer[1]
-        return output
+    def _config_register_bytes(channel, input_range, sample_rate):
+        key = (channel, input_range, sample_rate)
+        configs = _CONFIG_REGISTER_CACHE.get(key)
+        if configs is None:
+            config = Ads1118._build_config_register_bytearray(
+                channel, input_range, sample_rate
+            )
+            start_config = bytes(config)
+            # clearing the SS bit selects no new conversion
+            config[0] &= 0x7F
+            configs = (start_config, bytes(config))
+            _CONFIG_REGISTER_CACHE[key] = configs
+        return configs
+
+    @staticmethod
+    def _result_from_bytes(receive_buffer, channel, input_range):
+        return (
+            Ads1118._temperature_from_bytes(receive_buffer)
+            if (channel == MuxSelection.TEMPERATURE)
+            else Ads1118._voltage_from_bytes(receive_buffer, input_range)
+        )
 
     @staticmethod
     def _temperature_from_bytes(receive_buffer):
-        reading = Ads1118._int_from_two_bytes_signed_be(receive_buffer) >> 2
+        reading = struct.unpack_from(">h", receive_buffer)[0] >> 2
         return reading * 0.03125
 
     @staticmethod
     def _voltage_from_bytes(receive_buffer, fsr):
         lsb_size = ADS1118_LSB_SIZES[fsr]
-        return Ads1118._int_from_two_bytes_signed_be(receive_buffer) * lsb_size
+        return struct.unpack_from(">h", receive_buffer)[0] * lsb_size
@@ -4,7 +4,7 @@ drivers to work directly with pins.
 
 A PinManager creates and returns a ManagedDevice from a set of pins when requested. A
 variety of types of ManagedDevice are supported, from analog inputs to SPI buses. Once
-a pin has been provided to the PinManager, it will appear in use to any other software
+a device using a pin has been opened, the pin will appear in use to any other software
 that attempts to create a device using the pin. However, the PinManager itself may
 create additional devices that refer to the same pin. Deinitialization is handled when
 user code interacts with each ManagedDevice it has created.
@@ -40,11 +40,20 @@ import digitalio
 import busio
 import analogio
 
+# peripheral classes are bound once here so that creating a device does not look them up
+# through their modules each time
+_DigitalInOut = digitalio.DigitalInOut
+_SPI = busio.SPI
+_I2C = busio.I2C
+_AnalogIn = analogio.AnalogIn
+
 
 class _ManagedPin:
+    __slots__ = ("pin", "claimer")
+
     def __init__(self, pin):
         self.pin = pin
-        self.claimer = _DefaultPinClaimer(self)
+        self.claimer = _DEFAULT_PIN_CLAIMER
 
 
 class ManagedDevice:
@@ -53,9 +62,21 @@ class ManagedDevice:
     and used within a context opened in user code.
     """
 
-    def __init__(self, managed_pins, device_producer):
-        self._managed_pins = managed_pins
-        self._device_producer = device_producer
+    __slots__ = (
+        "_managed_pins",
+        "_device_constructor",
+        "_device_args",
+        "_device_kwargs",
+        "_instance",
+        "_active_contexts",
+    )
+
+    # The boxed device is constructed as device_constructor(*device_args, **device_kwargs)
+    def __init__(self, managed_pins, device_constructor, device_args, device_kwargs):
+        self._managed_pins = tuple(managed_pins)
+        self._device_constructor = device_constructor
+        self._device_args = device_args
+        self._device_kwargs = device_kwargs
         self._instance = None
         self._active_contexts = 0
 
@@ -98,7 +119,7 @@ class ManagedDevice:
         self._instance.deinit()
         self._instance = None
         for m_pin in self._managed_pins:
-            m_pin.claimer = _DefaultPinClaimer(m_pin)
+            m_pin.claimer = _DEFAULT_PIN_CLAIMER
 
     # Set the pins this device requires to be active and configured for this device
     # until the next call to _reclaim(). Also increments the number of contexts in
@@ -108,14 +129,14 @@ class ManagedDevice:
             self._active_contexts += 1
             return self._instance
         for m_pin in self._managed_pins:
-            if m_pin.claimer.is_running():
-                m_pin.claimer._reclaim()
-        for m_pin in self._managed_pins:
-            m_pin.claimer._reclaim()
-        self._instance = self._device_producer()
+            claimer = m_pin.claimer
+            if claimer.is_running():
+                claimer._reclaim()
+        self._instance = self._device_constructor(
+            *self._device_args, **self._device_kwargs
+        )
         for m_pin in self._managed_pins:
             m_pin.claimer = self
-            m_pin.is_claimed = True
         self._active_contexts += 1
         return self._instance
 
@@ -124,16 +145,17 @@ class ManagedDevice:
         self._active_contexts -= 1
 
 
+# Claimer for a pin which no ManagedDevice currently holds. No peripheral is allocated for the
+# pin until a device claims it, so there is never anything to release, and a single stateless
+# instance is shared by all such pins.
 class _DefaultPinClaimer:
-    def __init__(self, managed_pin):
-        self.m_pin = managed_pin
-        self._instance = digitalio.DigitalInOut(self.m_pin.pin)
+    __slots__ = ()
 
     def is_running(self):
         """
         Implementation of ManagedDevice.is_running() for a _DefaultPinClaimer
         """
-        return self._instance is not None
+        return False
 
     def is_busy(self):
         """
@@ -142,9 +164,10 @@ class _DefaultPinClaimer:
         return False
 
     def _reclaim(self):
-        if self._instance is not None:
-            self._instance.deinit()
-            self._instance = None
+        pass
+
+
+_DEFAULT_PIN_CLAIMER = _DefaultPinClaimer()
 
 
 class PinManager:
@@ -153,18 +176,14 @@ class PinManager:
     documentation for details.
     """
 
-    _instance = None
-
     @staticmethod
     def get_instance():
         """
-        Creates a PinManager and caches one if none exists, or returns the existing PinManager
-        if one has already been created. This method allows this class to be used according to
-        the singleton pattern.
+        Returns the PinManager shared by the whole application, which is created when this
+        module is imported. This method allows this class to be used according to the
+        singleton pattern.
         """
-        if PinManager._instance is None:
-            PinManager._instance = PinManager()
-        return PinManager._instance
+        return _INSTANCE
 
     def __init__(self):
         self._pins = {}
@@ -175,34 +194,43 @@ class PinManager:
             self._pins[pin] = _ManagedPin(pin)
         return self._pins[pin]
 
-    def _create_general_device(self, pins, device_type, device_producer):
+    # devices are cached by type, then by pins; pins map one-to-one onto managed pins, so the
+    # raw pins identify a device just as well and a cache hit needs no pin lookups
+    def _get_cached_device(self, pins, device_type):
+        devices_of_type = self._devices.get(device_type)
+        if devices_of_type is None:
+            return None
+        return devices_of_type.get(pins)
+
+    def _add_device(self, pins, device_type, device_constructor, device_kwargs):
+        devices_of_type = self._devices.get(device_type)
+        if devices_of_type is None:
+            devices_of_type = {}
+            self._devices[device_type] = devices_of_type
         m_pins = [self._get_pin_reference(pin) for pin in pins]
-        device_key = tuple(m_pins + [device_type])
-        if device_key not in self._devices:
-            self._devices[device_key] = ManagedDevice(m_pins, device_producer)
-        return self._devices[device_key]
+        device = ManagedDevice(m_pins, device_constructor, pins, device_kwargs)
+        devices_of_type[pins] = device
+        return device
+
+    def _create_general_device(self, pins, device_type, device_constructor):
+        device = self._get_cached_device(pins, device_type)
+        if device is None:
+            device = self._add_device(pins, device_type, device_constructor, {})
+        return device
 
     def create_digital_in_out(self, pin):
         """
         Creates and returns ManagedDevice wrapping a digitalio.DigitalInOut on the specified
         pin, or returns one from the cache if one has already been created.
         """
-        return self._create_general_device(
-            [pin],
-            digitalio.DigitalInOut,
-            (lambda: digitalio.DigitalInOut(pin)),
-        )
+        return self._create_general_device((pin,), _DigitalInOut, _DigitalInOut)
 
     def create_spi(self, clock, mosi, miso):
         """
         Creates and returns ManagedDevice wrapping a busio.SPI on the three specified pins,
         or returns one from the cache if one has already been created.
         """
-        return self._create_general_device(
-            [clock, mosi, miso],
-            busio.SPI,
-            (lambda: busio.SPI(clock, mosi, miso)),
-        )
+        return self._create_general_device((clock, mosi, miso), _SPI, _SPI)
 
     def create_i2c(self, scl, sda, frequency=100000):
         """
@@ -210,19 +238,21 @@ class PinManager:
         with the specified clock frequency, or returns one from the cache if one has already
         been created.
         """
-        return self._create_general_device(
-            [scl, sda],
-            (busio.I2C, frequency),
-            (lambda: busio.I2C(scl, sda, frequency=frequency)),
-        )
+        pins = (scl, sda)
+        device_type = (_I2C, frequency)
+        device = self._get_cached_device(pins, device_type)
+        if device is None:
+            # the keyword arguments are only needed to construct the device on a cache miss
+            device = self._add_device(pins, device_type, _I2C, {"frequency": frequency})
+        return device
 
     def create_analog_in(self, pin):
         """
         Creates and returns ManagedDevice wrapping a analogio.AnalogIn on the specified
         pin, or returns one from the cache if one has already been created.
         """
-        return self._create_general_device(
-            [pin],
-            analogio.AnalogIn,
-            (lambda: analogio.AnalogIn(pin)),
-        )
+        return self._create_general_device((pin,), _AnalogIn, _AnalogIn)
+
+
+# the PinManager returned by PinManager.get_instance()
+_INSTANCE = PinManager()
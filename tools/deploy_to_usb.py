@@ -108,7 +108,7 @@ def deploy_with_settings(deploy_type, target_drive, tmp_folder):
             file=sys.stderr,
         )
         deploy_types_string = filter(
-            (lambda x: (len(x) < 8) or (x[-8:] != "_testapp")), deploy_types
+            (lambda x: not x.endswith("_testapp")), deploy_types
         )
         deploy_types_string = list(map((lambda x: YELLOW(x)), deploy_types_string))
         deploy_types_string = (
@@ -1,20 +1,31 @@
 import os
+import shutil
 import deploy_to_usb
 import subprocess
 import tempfile
 
 deploy_path = os.path.join(tempfile.gettempdir(), "CIRCUITPY")
+analysis_path = os.path.join(tempfile.gettempdir(), "CIRCUITPY_ANALYSIS")
 config_path = os.path.abspath(os.path.join("config", "pylama.cfg"))
-analysis_passed = True
+
+# deploy every application into its own subdirectory so that pylama only needs to be
+# started once for all of them
+if os.path.exists(analysis_path):
+    shutil.rmtree(analysis_path)
+os.makedirs(analysis_path)
+analyzed_apps = []
 
 for app in os.listdir("applications"):
-    if (len(app) < 8) or (app[-8:] != "_testapp"):
+    if not app.endswith("_testapp") and os.path.isdir(
+        os.path.join("applications", app)
+    ):
         deploy_to_usb.deploy_with_settings(app, None, True)
-        pylama = subprocess.run(
-            ["pylama", "-o", config_path, deploy_path],
-            cwd=deploy_path,
-        )
-        if pylama.returncode != 0:
-            analysis_passed = False
+        shutil.move(deploy_path, os.path.join(analysis_path, app))
+        analyzed_apps.append(app)
+
+pylama = subprocess.run(
+    ["pylama", "-o", config_path, *analyzed_apps],
+    cwd=analysis_path,
+)
 
-exit(0 if analysis_passed else 1)
+exit(0 if pylama.returncode == 0 else 1)
@@ -1,162 +1,218 @@
+import asyncio
+import struct
 import unittest
+from unittest import mock
 
 import ads1118
+import pin_manager
+import custom_module_mocking
 
+_NON_BYTE_OBJECTS = (object(), {}, [], 3.0, -1, 256)
 
-class ADS1118_Test(unittest.TestCase):
+_GOOD_CHANNELS = (
+    ads1118.MuxSelection.CH0_SINGLE_END,
+    ads1118.MuxSelection.CH1_SINGLE_END,
+    ads1118.MuxSelection.CH2_SINGLE_END,
+    ads1118.MuxSelection.CH3_SINGLE_END,
+    ads1118.MuxSelection.CH0_CH1_DIFF,
+    ads1118.MuxSelection.CH0_CH3_DIFF,
+    ads1118.MuxSelection.CH1_CH3_DIFF,
+    ads1118.MuxSelection.CH2_CH3_DIFF,
+    ads1118.MuxSelection.TEMPERATURE,
+)
+_GOOD_FSRS = (
+    ads1118.InputRange.FSR_6_144V,
+    ads1118.InputRange.FSR_4_096V,
+    ads1118.InputRange.FSR_2_048V,
+    ads1118.InputRange.FSR_1_024V,
+    ads1118.InputRange.FSR_0_512V,
+    ads1118.InputRange.FSR_0_256V,
+)
+_GOOD_SPSS = (
+    ads1118.SamplingRate.RATE_8,
+    ads1118.SamplingRate.RATE_16,
+    ads1118.SamplingRate.RATE_32,
+    ads1118.SamplingRate.RATE_64,
+    ads1118.SamplingRate.RATE_128,
+    ads1118.SamplingRate.RATE_250,
+    ads1118.SamplingRate.RATE_475,
+    ads1118.SamplingRate.RATE_860,
+)
+_GOOD_SAMPLING_PARAMS = (
+    (
+        ads1118.MuxSelection.CH0_CH1_DIFF,
+        ads1118.InputRange.FSR_6_144V,
+        ads1118.SamplingRate.RATE_8,
+    ),
+    (
+        ads1118.MuxSelection.CH3_SINGLE_END,
+        ads1118.InputRange.FSR_0_256V,
+        ads1118.SamplingRate.RATE_860,
+    ),
+    (
+        ads1118.MuxSelection.CH0_SINGLE_END,
+        ads1118.InputRange.FSR_4_096V,
+        ads1118.SamplingRate.RATE_128,
+    ),
+    (
+        ads1118.MuxSelection.TEMPERATURE,
+        ads1118.InputRange.FSR_2_048V,
+        ads1118.SamplingRate.RATE_475,
+    ),
+)
+_BAD_SAMPLING_PARAMS = (
+    (-1, 0, 0),
+    (8, 0, 0),
+    (254, 0, 0),
+    (256, 0, 0),
+    (4.5, 0, 0),
+    (0, -1, 0),
+    (0, 8, 0),
+    (0, 4.5, 0),
+    (0, 0, -1),
+    (0, 0, 8),
+    (0, 0, 4.5),
+)
+
+# raw temperature sensor readings, with the 14-bit result left-justified, and their values
+_TEMPERATURE_CASES = (
+    (bytes((0b_01_0000_00, 0b_00_0000_00)), 128),
+    (bytes((0b_00_1111_11, 0b_11_1111_00)), 127.96875),
+    (bytes((0b_00_1100_10, 0b_00_0000_00)), 100),
+    (bytes((0b_00_1001_01, 0b_10_0000_00)), 75),
+    (bytes((0b_00_0110_01, 0b_00_0000_00)), 50),
+    (bytes((0b_00_0011_00, 0b_10_0000_00)), 25),
+    (bytes((0b_00_0000_00, 0b_00_1000_00)), 0.25),
+    (bytes((0b_00_0000_00, 0b_00_0001_00)), 0.03125),
+    (bytes((0b_00_0000_00, 0b_00_0000_00)), 0),
+    (bytes((0b_00_0000_00, 0b_00_0000_10)), 0),
+    (bytes((0b_00_0000_00, 0b_00_0000_01)), 0),
+    (bytes((0b_11_1111_11, 0b_11_1000_00)), -0.25),
+    (bytes((0b_11_1100_11, 0b_10_0000_00)), -25),
+    (bytes((0b_11_1011_00, 0b_00_0000_00)), -40),
+)
+_FULL_SCALE_RANGES = (
+    (ads1118.InputRange.FSR_6_144V, 6.144),
+    (ads1118.InputRange.FSR_4_096V, 4.096),
+    (ads1118.InputRange.FSR_2_048V, 2.048),
+    (ads1118.InputRange.FSR_1_024V, 1.024),
+    (ads1118.InputRange.FSR_0_512V, 0.512),
+    (ads1118.InputRange.FSR_0_256V, 0.256),
+)
+# raw voltage readings and their values as a fraction of the full-scale range
+_VOLTAGE_FRACTION_CASES = (
+    (b"\x7F\xFF", (2**15 - 1) / (2**15)),
+    (b"\x00\x01", 1 / (2**15)),
+    (b"\x00\x00", 0),
+    (b"\xFF\xFF", -1 / (2**15)),
+    (b"\x80\x00", -1),
+)
+
+
+class FakeAds1118:
+    """
+    Simulates the SPI and DRDY behavior of an ADS1118 in single-shot mode.
+
+    Every command is recorded. Each transfer shifts out the result of the last conversion,
+    and a command with the SS bit set starts a new conversion whose raw result is four times
+    its (1-based) index. DRDY stays high for `polls_until_ready` reads after a conversion
+    starts.
+    """
+
+    def __init__(self, polls_until_ready=0, max_commands=16):
+        self.commands = []
+        self.conversions = 0
+        self.polls_until_ready = polls_until_ready
+        self.max_commands = max_commands
+        self._output = bytes(2)
+        self._polls = 0
+
+    def transfer(self, out_buffer, in_buffer):
+        command = bytes(out_buffer)
+        self.commands.append(command)
+        if len(self.commands) > self.max_commands:
+            raise AssertionError("ADC was sent too many commands")
+        in_buffer[:] = self._output
+        if command[0] & 0x80:
+            self.conversions += 1
+            self._output = struct.pack(">h", 4 * self.conversions)
+            self._polls = 0
+
+    def drdy(self):
+        self._polls += 1
+        return self._polls <= self.polls_until_ready
+
+
+def create_fake_ads1118(fake):
+    class FakeSpi(custom_module_mocking.SPI_Test):
+        def write_readinto(self, out_buffer, in_buffer, **kwargs):
+            super().write_readinto(out_buffer, in_buffer)
+            fake.transfer(out_buffer, in_buffer)
+
+    class FakeDigitalInOut(custom_module_mocking.DigitalInOut_Test):
+        def __init__(self, gpio):
+            super().__init__(gpio)
+            self._gpio = gpio
+
+        @property
+        def value(self):
+            if self._gpio == "MISO":
+                return fake.drdy()
+            return self._value
+
+        @value.setter
+        def value(self, pin_state):
+            self._value = pin_state
 
-    _NON_BYTE_OBJECTS = [object(), {}, [], 3.0, -1, 256]
+    pin_manager._SPI = FakeSpi
+    pin_manager._DigitalInOut = FakeDigitalInOut
+    pin_manager._INSTANCE = pin_manager.PinManager()
+    return ads1118.Ads1118("SCK", "MOSI", "MISO", "CS")
+
+
+# monotonic_ns replacement which advances by 1us on every call
+def fake_monotonic_ns_source():
+    ticks = iter(range(0, 1 << 62, 1000))
+    return lambda: next(ticks)
+
+
+class ADS1118_Test(unittest.TestCase):
 
     def test_channel_parameter_validation(self):
-        for ch in [
-            ads1118.MuxSelection.CH0_SINGLE_END,
-            ads1118.MuxSelection.CH1_SINGLE_END,
-            ads1118.MuxSelection.CH2_SINGLE_END,
-            ads1118.MuxSelection.CH3_SINGLE_END,
-            ads1118.MuxSelection.CH0_CH1_DIFF,
-            ads1118.MuxSelection.CH0_CH3_DIFF,
-            ads1118.MuxSelection.CH1_CH3_DIFF,
-            ads1118.MuxSelection.CH2_CH3_DIFF,
-            ads1118.MuxSelection.TEMPERATURE,
-        ]:
-            failure = None
-            try:
+        for ch in _GOOD_CHANNELS:
+            with self.subTest(channel=ch):
                 ads1118.Ads1118._check_channel_param(ch)
-            except AssertionError as e:
-                failure = e
-            self.assertIsNone(failure)
-        for non_byte in ADS1118_Test._NON_BYTE_OBJECTS:
-            self.assertRaises(
-                AssertionError,
-                ads1118.Ads1118._check_channel_param,
-                non_byte,
-            )
-        self.assertRaises(
-            AssertionError,
-            ads1118.Ads1118._check_channel_param,
-            120,
-        )
+        for bad in _NON_BYTE_OBJECTS + (120,):
+            with self.subTest(channel=bad):
+                self.assertRaises(
+                    AssertionError, ads1118.Ads1118._check_channel_param, bad
+                )
 
     def test_fsr_validation(self):
-        for fsr in [
-            ads1118.InputRange.FSR_6_144V,
-            ads1118.InputRange.FSR_4_096V,
-            ads1118.InputRange.FSR_2_048V,
-            ads1118.InputRange.FSR_1_024V,
-            ads1118.InputRange.FSR_0_512V,
-            ads1118.InputRange.FSR_0_256V,
-        ]:
-            failure = None
-            try:
+        for fsr in _GOOD_FSRS:
+            with self.subTest(input_range=fsr):
                 ads1118.Ads1118._check_fsr_param(fsr)
-            except AssertionError as e:
-                failure = e
-            self.assertIsNone(failure)
-        for non_byte in ADS1118_Test._NON_BYTE_OBJECTS:
-            self.assertRaises(
-                AssertionError,
-                ads1118.Ads1118._check_fsr_param,
-                non_byte,
-            )
-        self.assertRaises(
-            AssertionError,
-            ads1118.Ads1118._check_fsr_param,
-            120,
-        )
-        self.assertRaises(
-            AssertionError,
-            ads1118.Ads1118._check_fsr_param,
-            255,
-        )
+        for bad in _NON_BYTE_OBJECTS + (120, 255):
+            with self.subTest(input_range=bad):
+                self.assertRaises(AssertionError, ads1118.Ads1118._check_fsr_param, bad)
 
     def test_sps_validation(self):
-        for sps in [
-            ads1118.SamplingRate.RATE_8,
-            ads1118.SamplingRate.RATE_16,
-            ads1118.SamplingRate.RATE_32,
-            ads1118.SamplingRate.RATE_64,
-            ads1118.SamplingRate.RATE_128,
-            ads1118.SamplingRate.RATE_250,
-            ads1118.SamplingRate.RATE_475,
-            ads1118.SamplingRate.RATE_860,
-        ]:
-            failure = None
-            try:
+        for sps in _GOOD_SPSS:
+            with self.subTest(sample_rate=sps):
                 ads1118.Ads1118._check_sps_param(sps)
-            except AssertionError as e:
-                failure = e
-            self.assertIsNone(failure)
-        for non_byte in ADS1118_Test._NON_BYTE_OBJECTS:
-            self.assertRaises(
-                AssertionError,
-                ads1118.Ads1118._check_sps_param,
-                non_byte,
-            )
-        self.assertRaises(
-            AssertionError,
-            ads1118.Ads1118._check_sps_param,
-            120,
-        )
-        self.assertRaises(
-            AssertionError,
-            ads1118.Ads1118._check_sps_param,
-            255,
-        )
+        for bad in _NON_BYTE_OBJECTS + (120, 255):
+            with self.subTest(sample_rate=bad):
+                self.assertRaises(AssertionError, ads1118.Ads1118._check_sps_param, bad)
 
     def test_parameter_validation(self):
-
-        good_params = [
-            (
-                ads1118.MuxSelection.CH0_CH1_DIFF,
-                ads1118.InputRange.FSR_6_144V,
-                ads1118.SamplingRate.RATE_8,
-            ),
-            (
-                ads1118.MuxSelection.CH3_SINGLE_END,
-                ads1118.InputRange.FSR_0_256V,
-                ads1118.SamplingRate.RATE_860,
-            ),
-            (
-                ads1118.MuxSelection.CH0_SINGLE_END,
-                ads1118.InputRange.FSR_4_096V,
-                ads1118.SamplingRate.RATE_128,
-            ),
-            (
-                ads1118.MuxSelection.TEMPERATURE,
-                ads1118.InputRange.FSR_2_048V,
-                ads1118.SamplingRate.RATE_475,
-            ),
-        ]
-        for params in good_params:
-            failure = None
-            try:
-                ads1118.Ads1118._check_sampling_params(params[0], params[1], params[2])
-            except AssertionError as e:
-                failure = e
-            self.assertIsNone(failure)
-
-        # Test with bad parameters
-        bad_params = [
-            (-1, 0, 0),
-            (8, 0, 0),
-            (254, 0, 0),
-            (256, 0, 0),
-            (4.5, 0, 0),
-            (0, -1, 0),
-            (0, 8, 0),
-            (0, 4.5, 0),
-            (0, 0, -1),
-            (0, 0, 8),
-            (0, 0, 4.5),
-        ]
-        for params in bad_params:
-            self.assertRaises(
-                AssertionError,
-                ads1118.Ads1118._check_sampling_params,
-                params[0],
-                params[1],
-                params[2],
-            )
+        for params in _GOOD_SAMPLING_PARAMS:
+            with self.subTest(params=params):
+                ads1118.Ads1118._check_sampling_params(*params)
+        for params in _BAD_SAMPLING_PARAMS:
+            with self.subTest(params=params):
+                self.assertRaises(
+                    AssertionError, ads1118.Ads1118._check_sampling_params, *params
+                )
 
     def test_config_register_format(self):
         self.assertEqual(
@@ -192,58 +248,107 @@ class ADS1118_Test(unittest.TestCase):
             b"\xFB\x7A",
         )
 
+    def test_config_register_cache(self):
+        for params in [
+            (
+                ads1118.MuxSelection.CH0_SINGLE_END,
+                ads1118.InputRange.FSR_4_096V,
+                ads1118.SamplingRate.RATE_128,
+            ),
+            (
+                ads1118.MuxSelection.TEMPERATURE,
+                ads1118.InputRange.FSR_0_256V,
+                ads1118.SamplingRate.RATE_64,
+            ),
+        ]:
+            configs = ads1118.Ads1118._config_register_bytes(*params)
+            config = ads1118.Ads1118._build_config_register_bytearray(*params)
+            self.assertEqual(configs[0], config)
+            self.assertEqual(configs[1][0], config[0] & 0x7F)
+            self.assertEqual(configs[1][1], config[1])
+            self.assertIs(configs, ads1118.Ads1118._config_register_bytes(*params))
+
     def test_temperature_conversion(self):
-        temp_sensor_data = [
-            (0b_01_0000_00, 0b_00_0000_00, 128),
-            (0b_00_1111_11, 0b_11_1111_00, 127.96875),
-            (0b_00_1100_10, 0b_00_0000_00, 100),
-            (0b_00_1001_01, 0b_10_0000_00, 75),
-            (0b_00_0110_01, 0b_00_0000_00, 50),
-            (0b_00_0011_00, 0b_10_0000_00, 25),
-            (0b_00_0000_00, 0b_00_1000_00, 0.25),
-            (0b_00_0000_00, 0b_00_0001_00, 0.03125),
-            (0b_00_0000_00, 0b_00_0000_00, 0),
-            (0b_00_0000_00, 0b_00_0000_10, 0),
-            (0b_00_0000_00, 0b_00_0000_01, 0),
-            (0b_11_1111_11, 0b_11_1000_00, -0.25),
-            (0b_11_1100_11, 0b_10_0000_00, -25),
-            (0b_11_1011_00, 0b_00_0000_00, -40),
-        ]
-        for case in temp_sensor_data:
-            self.assertAlmostEqual(
-                ads1118.Ads1118._temperature_from_bytes(bytes([case[0], case[1]])),
-                case[2],
-            )
+        for raw, temperature in _TEMPERATURE_CASES:
+            with self.subTest(raw=raw):
+                self.assertAlmostEqual(
+                    ads1118.Ads1118._temperature_from_bytes(raw), temperature
+                )
 
     def test_voltage_conversion(self):
-        for fsr in [
-            (ads1118.InputRange.FSR_6_144V, 6.144),
-            (ads1118.InputRange.FSR_4_096V, 4.096),
-            (ads1118.InputRange.FSR_2_048V, 2.048),
-            (ads1118.InputRange.FSR_1_024V, 1.024),
-            (ads1118.InputRange.FSR_0_512V, 0.512),
-            (ads1118.InputRange.FSR_0_256V, 0.256),
-        ]:
-            self.assertAlmostEqual(
-                ads1118.Ads1118._voltage_from_bytes(b"\x7F\xFF", fsr[0]),
-                fsr[1] * (2**15 - 1) / (2**15),
-            )
-            self.assertAlmostEqual(
-                ads1118.Ads1118._voltage_from_bytes(b"\x00\x01", fsr[0]),
-                fsr[1] / (2**15),
-            )
-            self.assertAlmostEqual(
-                ads1118.Ads1118._voltage_from_bytes(b"\x00\x00", fsr[0]),
-                0,
-            )
-            self.assertAlmostEqual(
-                ads1118.Ads1118._voltage_from_bytes(b"\xFF\xFF", fsr[0]),
-                -fsr[1] / (2**15),
-            )
-            self.assertAlmostEqual(
-                ads1118.Ads1118._voltage_from_bytes(b"\x80\x00", fsr[0]),
-                -fsr[1],
+        for fsr, full_scale in _FULL_SCALE_RANGES:
+            for raw, fraction in _VOLTAGE_FRACTION_CASES:
+                with self.subTest(input_range=fsr, raw=raw):
+                    self.assertAlmostEqual(
+                        ads1118.Ads1118._voltage_from_bytes(raw, fsr),
+                        full_scale * fraction,
+                    )
+
+    def test_take_sample_waits_for_drdy(self):
+        fake = FakeAds1118(polls_until_ready=3)
+        adc = create_fake_ads1118(fake)
+        with mock.patch.object(
+            ads1118.time, "monotonic_ns", fake_monotonic_ns_source()
+        ):
+            result = asyncio.run(
+                adc.take_sample(
+                    ads1118.MuxSelection.CH0_SINGLE_END,
+                    ads1118.InputRange.FSR_4_096V,
+                    ads1118.SamplingRate.RATE_860,
+                )
             )
+        config, readback_config = ads1118.Ads1118._config_register_bytes(
+            ads1118.MuxSelection.CH0_SINGLE_END,
+            ads1118.InputRange.FSR_4_096V,
+            ads1118.SamplingRate.RATE_860,
+        )
+        # DRDY must be polled until it goes low rather than the command being resent
+        self.assertEqual(fake.commands, [config, readback_config])
+        self.assertAlmostEqual(result, 4 * 125e-6)
+
+    def test_take_samples(self):
+        samples = [
+            (
+                ads1118.MuxSelection.CH0_SINGLE_END,
+                ads1118.InputRange.FSR_4_096V,
+                ads1118.SamplingRate.RATE_860,
+            ),
+            (
+                ads1118.MuxSelection.TEMPERATURE,
+                ads1118.InputRange.FSR_2_048V,
+                ads1118.SamplingRate.RATE_860,
+            ),
+            (
+                ads1118.MuxSelection.CH1_SINGLE_END,
+                ads1118.InputRange.FSR_0_256V,
+                ads1118.SamplingRate.RATE_860,
+            ),
+        ]
+        fake = FakeAds1118()
+        adc = create_fake_ads1118(fake)
+        with mock.patch.object(
+            ads1118.time, "monotonic_ns", fake_monotonic_ns_source()
+        ):
+            results = asyncio.run(adc.take_samples(samples))
+        configs = [ads1118.Ads1118._config_register_bytes(*s) for s in samples]
+
+        # results are returned in the order the samples were requested
+        self.assertEqual(len(results), 3)
+        self.assertAlmostEqual(results[0], 4 * 125e-6)
+        self.assertAlmostEqual(results[1], 2 * 0.03125)
+        self.assertAlmostEqual(results[2], 12 * 7.8125e-6)
+
+        # each command reads out the previous sample, and a final readback ends the sequence
+        self.assertEqual(len(fake.commands), len(samples) + 1)
+        self.assertEqual(fake.commands[:-1], [config for config, _ in configs])
+        self.assertEqual(fake.commands[-1], configs[-1][1])
+        self.assertEqual(fake.commands[-1][0] & 0x80, 0)
+
+    def test_take_samples_empty(self):
+        fake = FakeAds1118()
+        adc = create_fake_ads1118(fake)
+        self.assertEqual(asyncio.run(adc.take_samples([])), [])
+        self.assertEqual(fake.commands, [])
 
 
 if __name__ == "__main__":
@@ -7,12 +7,17 @@ import custom_module_mocking
 def create_pin_manager_specific_mocking():
     # replace magicmock with an actual implementation for specific constructors
     # that we're using to test object retention requirements
-    pin_manager.digitalio.DigitalInOut = custom_module_mocking.DigitalInOut_Test
-    pin_manager.busio.SPI = custom_module_mocking.SPI_Test
+    pin_manager._DigitalInOut = custom_module_mocking.DigitalInOut_Test
+    pin_manager._SPI = custom_module_mocking.SPI_Test
 
 
 class PinManager_Test(unittest.TestCase):
 
+    def test_get_instance(self):
+        inst = pin_manager.PinManager.get_instance()
+        self.assertIsInstance(inst, pin_manager.PinManager)
+        self.assertIs(inst, pin_manager.PinManager.get_instance())
+
     def test_digital_in_out(self):
         create_pin_manager_specific_mocking()
         inst = pin_manager.PinManager()
@@ -80,6 +85,50 @@ class PinManager_Test(unittest.TestCase):
 
             self.assertRaises(RuntimeError, set_pin_high)
 
+    def test_device_caching(self):
+        create_pin_manager_specific_mocking()
+        inst = pin_manager.PinManager()
+        spi = inst.create_spi("D1", "D2", "D3")
+        gpio1 = inst.create_digital_in_out("D1")
+        i2c = inst.create_i2c("D4", "D5")
+        self.assertIs(spi, inst.create_spi("D1", "D2", "D3"))
+        self.assertIs(gpio1, inst.create_digital_in_out("D1"))
+        self.assertIs(i2c, inst.create_i2c("D4", "D5", frequency=100000))
+        self.assertIsNot(spi, inst.create_spi("D3", "D2", "D1"))
+        self.assertIsNot(gpio1, inst.create_analog_in("D1"))
+        self.assertIsNot(i2c, inst.create_i2c("D4", "D5", frequency=400000))
+
+    def test_lazy_pin_claiming(self):
+        created = []
+
+        class CountingDigitalInOut(custom_module_mocking.DigitalInOut_Test):
+            def __init__(self, gpio):
+                super().__init__(gpio)
+                created.append(gpio)
+
+        class CountingSPI(custom_module_mocking.SPI_Test):
+            def __init__(self, clock, mosi, miso):
+                super().__init__(clock, mosi, miso)
+                created.append((clock, mosi, miso))
+
+        pin_manager._DigitalInOut = CountingDigitalInOut
+        pin_manager._SPI = CountingSPI
+        inst = pin_manager.PinManager()
+        spi = inst.create_spi("D1", "D2", "D3")
+        D1_gpio = inst.create_digital_in_out("D1")
+        # creating devices must not construct any peripherals
+        self.assertEqual(created, [])
+        with spi:
+            pass
+        self.assertEqual(created, [("D1", "D2", "D3")])
+        with D1_gpio:
+            pass
+        # reclaiming the bus for D1 must not claim a peripheral for D2 or D3
+        self.assertEqual(created, [("D1", "D2", "D3"), "D1"])
+        self.assertFalse(spi.is_running())
+        self.assertFalse(inst._get_pin_reference("D2").claimer.is_running())
+        self.assertFalse(inst._get_pin_reference("D3").claimer.is_running())
+
     def test_state_functions(self):
         create_pin_manager_specific_mocking()
         inst = pin_manager.PinManager()